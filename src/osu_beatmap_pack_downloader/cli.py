@@ -1,25 +1,63 @@
 #!/usr/bin/env python3
 import os
-import requests
 import argparse
 import time
 import random
 import concurrent.futures
+import functools
+import itertools
 import queue
 import threading
 import logging
+import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
 from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
 import json
+import shutil
+import socket
+import urllib.request
 from pathlib import Path
 import hashlib
 
+# Optional HTTP/2 support (pip install "httpx[http2]")
+try:
+    import httpx
+    import h2  # noqa: F401 - required by httpx for http2=True
+except ImportError:
+    httpx = None
+
+# Optional faster JSON for the config file (pip install orjson)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Constants for performance tuning
-DEFAULT_CHUNK_SIZE = 8192  # 8KB chunks
+DEFAULT_CHUNK_SIZE = 262144  # 256KB chunks
+LEGACY_DEFAULT_CHUNK_SIZE = 8192  # Old default, still stored in older config files
+DEFAULT_WRITE_BUFFER_SIZE = 8 * 1024 * 1024  # 8MB file write buffer
+DOWNLOAD_HOST = 'packs.ppy.sh'
 DEFAULT_TIMEOUT = 30  # seconds
 DEFAULT_THREADS = 3  # concurrent downloads
 DEFAULT_CONFIG_FILE = 'osu_downloader_config.json'
 DEFAULT_LOG_LEVEL = 'INFO'
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 1  # seconds, doubled per retry
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+MIN_PACK_SIZE = 1024  # bytes; full responses this small are error pages, not packs
+
+# Headers to mimic a browser
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Cache-Control': 'max-age=0'
+}
 
 # Set up logger
 logging.basicConfig(
@@ -31,13 +69,171 @@ logging.basicConfig(
     ]
 )
 logger = logging.getLogger('osu_downloader')
+# httpx logs every request at INFO; keep it out of the progress output
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+@functools.lru_cache(maxsize=None)
+def get_download_urls(pack_number):
+    """Generate possible download URLs for a given pack number."""
+    return (
+        f"https://{DOWNLOAD_HOST}/S{pack_number}%20-%20osu%21%20Beatmap%20Pack%20%23{pack_number}.zip",
+        f"https://{DOWNLOAD_HOST}/S{pack_number}%20-%20Beatmap%20Pack%20%23{pack_number}.zip",
+        f"https://{DOWNLOAD_HOST}/S{pack_number}%20-%20Beatmap%20Pack%20%23{pack_number}.7z"
+    )
+
+URL_PATTERN_COUNT = len(get_download_urls(0))
+
+def get_proxy_url():
+    """Return the proxy for packs.ppy.sh from HTTPS_PROXY/NO_PROXY (or system settings), if any."""
+    proxy_url = urllib.request.getproxies().get('https')
+    if proxy_url and not urllib.request.proxy_bypass(DOWNLOAD_HOST):
+        return proxy_url
+    return None
+
+@functools.lru_cache(maxsize=None)
+def get_filename_from_url(url, pack_number):
+    """Extract appropriate filename from URL."""
+    if url.endswith('.7z'):
+        return f"Beatmap Pack #{pack_number}.7z"
+    elif "osu%21" in url:
+        return f"osu! Beatmap Pack #{pack_number}.zip"
+    else:
+        return f"Beatmap Pack #{pack_number}.zip"
+
+@functools.lru_cache(maxsize=None)
+def resolve_host(host):
+    """Resolve a hostname to its IP addresses (in getaddrinfo order) once per process."""
+    infos = socket.getaddrinfo(host, None, allowed_gai_family(), socket.SOCK_STREAM)
+    return tuple(dict.fromkeys(info[4][0] for info in infos))
+
+class _CachedDNSMixin:
+    """Connection mixin that connects to the host's cached address instead of re-resolving it."""
+    
+    def _new_conn(self):
+        try:
+            addresses = resolve_host(self._dns_host)
+        except OSError:
+            # Let urllib3 resolve (and report the failure) as usual
+            return super()._new_conn()
+        
+        # Only the socket connect uses _dns_host; restore it so TLS SNI,
+        # certificate checks and the Host header still see the hostname.
+        # Like create_connection(), fall through the addresses in order
+        hostname = self._dns_host
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError as e:  # Includes NewConnectionError
+                    error = e
+            raise error
+        finally:
+            self._dns_host = hostname
+
+class _CachedDNSHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+class _CachedDNSHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+class _HTTP2Response:
+    """Streaming httpx response exposing the parts of urllib3's HTTPResponse API used here."""
+    
+    def __init__(self, response):
+        self._response = response
+        self._chunks = None
+        self.status = response.status_code
+        self.headers = response.headers
+    
+    def stream(self, amt):
+        return self._response.iter_bytes(amt)
+    
+    def read(self, amt):
+        # shutil.copyfileobj only needs each read to return some bytes, or b'' at the end
+        if self._chunks is None:
+            self._chunks = self._response.iter_bytes(amt)
+        return next(self._chunks, b'')
+    
+    def drain_conn(self):
+        self._response.read()
+    
+    def release_conn(self):
+        self._response.close()
+    
+    def close(self):
+        self._response.close()
+
+class _HTTP2Client:
+    """Shared httpx client that multiplexes all workers' requests over HTTP/2.
+    
+    Offers the same request() call as urllib3.PoolManager so the download code
+    works with either client.
+    """
+    
+    def __init__(self, max_connections):
+        transport = httpx.HTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections),
+            # An explicit transport ignores proxy environment variables
+            proxy=get_proxy_url(),
+            retries=DEFAULT_RETRIES,  # Connection errors only; status retries are below
+            # TCP_NODELAY, as urllib3 sets; receive buffers are left to kernel autotuning
+            socket_options=HTTPConnection.default_socket_options
+        )
+        self._client = httpx.Client(
+            transport=transport,
+            # No pool timeout: like urllib3's block=True, wait for a free connection
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, pool=None),
+            # Connection-specific headers are not allowed in HTTP/2. Ask for the raw
+            # bytes as urllib3 does: resume offsets and progress assume what is
+            # written to the .part matches Content-Length on the wire
+            headers={**{k: v for k, v in DEFAULT_HEADERS.items() if k != 'Connection'},
+                     'Accept-Encoding': 'identity'}
+        )
+    
+    def request(self, method, url, headers=None, redirect=True, preload_content=True):
+        request = self._client.build_request(method, url, headers=headers)
+        for attempt in range(DEFAULT_RETRIES + 1):
+            response = self._client.send(request, stream=not preload_content, follow_redirects=redirect)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == DEFAULT_RETRIES:
+                break
+            response.close()
+            time.sleep(DEFAULT_BACKOFF_FACTOR * (2 ** attempt))
+        
+        return _HTTP2Response(response)
+
+def _make_throttle(bandwidth_limit):
+    """Return a function that sleeps as needed to keep a transfer under bandwidth_limit MB/s."""
+    rate = bandwidth_limit * 1024 * 1024
+    next_emit_ts = time.monotonic()
+    
+    def throttle(nbytes):
+        nonlocal next_emit_ts
+        # Each chunk books nbytes / rate seconds after the previous deadline; the
+        # chunk that just arrived already spent its transfer time, so at most one
+        # chunk's worth of slow-network credit is banked
+        now = time.monotonic()
+        interval = nbytes / rate
+        next_emit_ts = max(next_emit_ts, now - interval) + interval
+        delay = next_emit_ts - now
+        if delay > 0:
+            time.sleep(delay)
+    
+    return throttle
 
 class DownloadManager:
     """Manages the download queue and workers."""
     
     def __init__(self, download_dir, max_threads=DEFAULT_THREADS, 
                  chunk_size=DEFAULT_CHUNK_SIZE, delay=True, 
-                 resume=True, bandwidth_limit=None):
+                 resume=True, bandwidth_limit=None, existing_files=None):
         self.download_dir = download_dir
         self.max_threads = max_threads
         self.chunk_size = chunk_size
@@ -48,24 +244,55 @@ class DownloadManager:
         # Create download directory
         os.makedirs(download_dir, exist_ok=True)
         
-        # Download queue and results
-        self.queue = queue.Queue()
+        # Each worker needs one connection to stream plus one per URL pattern while
+        # probing (a probe still finishing can overlap the next GET)
+        self._pool_size = self.max_threads * (URL_PATTERN_COUNT + 1)
+        
+        # Shared pool for the HEAD probes, created when downloads start
+        self._probe_executor = None
+        
+        # One HTTP client shared by all workers: HTTP/2 over a single connection
+        # when httpx is installed, otherwise a urllib3 connection pool
+        if httpx is not None:
+            self._http = _HTTP2Client(self._pool_size)
+            logger.debug("Using httpx with HTTP/2")
+        else:
+            self._http = self._create_pool_manager()
+        
+        # Packs to download and results; workers claim packs by index
+        self._pack_list = []
+        self._next = None
         self.results = {}
         self.downloads_in_progress = {}
-        self.lock = threading.Lock()
         
-        # Progress tracking
+        # Progress tracking; one lock guards all shared state
         self.total_packs = 0
         self.completed_packs = 0
         self.failed_packs = 0
-        self.progress_lock = threading.Lock()
+        self._state_lock = threading.RLock()
+        
+        # Workers report finished packs as events; only the progress reporter
+        # drains them, so it owns completed_packs/failed_packs without locking
+        self._events = queue.SimpleQueue()
+        self._workers_done = threading.Event()
+        
+        # Earliest monotonic time the next download may start (shared pacing)
+        self._next_allowed_ts = 0.0
+        
+        # Files currently being written (pack number -> open file); the progress
+        # reporter samples their positions instead of workers counting bytes
+        self._active_files = {}
         
         # Status for each pack
         self.pack_status = {}
         
+        # Names of files in download_dir; listed once when downloads start
+        # unless the caller already has the listing
+        self._existing_files = set(existing_files) if existing_files is not None else None
+        
     def add_pack(self, pack_number):
         """Add a pack to the download queue."""
-        self.queue.put(pack_number)
+        self._pack_list.append(pack_number)
         self.total_packs += 1
         self.pack_status[pack_number] = {
             'status': 'queued',
@@ -81,7 +308,19 @@ class DownloadManager:
         """Start the download process with multiple threads."""
         logger.info(f"Starting {self.max_threads} download threads for {self.total_packs} packs")
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+        # Freeze the pack list; next() on a shared counter hands each index to exactly one worker
+        self._pack_list = tuple(self._pack_list)
+        self._next = itertools.count()
+        
+        # List the download directory once instead of stat'ing every candidate file per pack
+        if self._existing_files is None:
+            self._existing_files = set(os.listdir(self.download_dir))
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads) as executor, \
+             concurrent.futures.ThreadPoolExecutor(max_workers=self.max_threads * URL_PATTERN_COUNT,
+                                                   thread_name_prefix='probe') as probe_executor:
+            self._probe_executor = probe_executor
+            
             # Start the progress reporter in a separate thread
             progress_thread = threading.Thread(target=self._progress_reporter)
             progress_thread.daemon = True
@@ -95,7 +334,11 @@ class DownloadManager:
             
             # Wait for all tasks to complete
             concurrent.futures.wait(futures)
-            
+            self._workers_done.set()
+        
+        # Let the reporter apply the last events before summarizing
+        progress_thread.join()
+        
         # Final progress report
         self._print_final_summary()
         
@@ -103,75 +346,101 @@ class DownloadManager:
     
     def _download_worker(self):
         """Worker function that processes the download queue."""
-        # Create a session for this worker
-        session = self._create_optimized_session()
-        
-        while not self.queue.empty():
+        while True:
+            # Claim the next pack from the list
+            i = next(self._next)
+            if i >= len(self._pack_list):
+                break  # All packs claimed, worker is done
+            pack_number = self._pack_list[i]
+            
+            # Pace download starts across all workers if enabled
+            if self.delay:
+                self._wait_for_turn()
+            
             try:
-                # Get the next pack from the queue
-                pack_number = self.queue.get(block=False)
-                
                 # Update pack status
-                with self.lock:
+                with self._state_lock:
                     self.pack_status[pack_number]['status'] = 'downloading'
                     self.downloads_in_progress[pack_number] = True
                 
                 # Try to download the pack
-                success, url, file_path = self._download_pack(pack_number, session)
+                success, url, file_path = self._download_pack(pack_number)
                 
                 # Update results
-                with self.lock:
+                with self._state_lock:
                     self.results[pack_number] = {
                         'success': success,
                         'url': url,
                         'file_path': file_path
                     }
+                    self.pack_status[pack_number]['status'] = 'completed' if success else 'failed'
                     
-                    # Update counters
-                    with self.progress_lock:
-                        if success:
-                            self.completed_packs += 1
-                            self.pack_status[pack_number]['status'] = 'completed'
-                        else:
-                            self.failed_packs += 1
-                            self.pack_status[pack_number]['status'] = 'failed'
-                        
-                        # Remove from in-progress list
-                        if pack_number in self.downloads_in_progress:
-                            del self.downloads_in_progress[pack_number]
+                    # Remove from in-progress list
+                    if pack_number in self.downloads_in_progress:
+                        del self.downloads_in_progress[pack_number]
                 
-                # Delay between downloads if enabled
-                if self.delay and success:
-                    delay_time = random.uniform(0.5, 1.5)
-                    time.sleep(delay_time)
+                # Counters are updated by the progress reporter
+                self._events.put(('done', pack_number, success))
                 
-            except queue.Empty:
-                break  # Queue is empty, worker is done
             except Exception as e:
                 logger.error(f"Worker error: {str(e)}")
-                with self.progress_lock:
-                    self.failed_packs += 1
+                self._events.put(('done', pack_number, False))
+    
+    def _wait_for_turn(self):
+        """Wait until this worker may start its next download.
+        
+        Starts are spaced by a random 0.5-1.5s divided among the workers, which
+        keeps the overall request rate of the old per-worker sleep without
+        leaving a worker idle after each download.
+        """
+        with self._state_lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed_ts)
+            self._next_allowed_ts = start + random.uniform(0.5, 1.5) / self.max_threads
+        
+        # Sleep outside the lock so other workers can claim later slots
+        if start > now:
+            time.sleep(start - now)
     
     def _progress_reporter(self):
         """Reports progress periodically without breaking the terminal."""
         last_report_time = time.time()
         
-        while self.completed_packs + self.failed_packs < self.total_packs:
+        while not self._workers_done.is_set():
+            self._drain_events()
             current_time = time.time()
             
             # Report every second
             if current_time - last_report_time >= 1.0:
+                self._sample_progress(current_time - last_report_time)
                 self._print_progress()
                 last_report_time = current_time
             
-            time.sleep(0.2)  # Check progress 5 times per second
+            self._workers_done.wait(0.2)  # Check progress 5 times per second
+        
+        self._drain_events()
+    
+    def _drain_events(self):
+        """Apply pending worker events to the counters (progress reporter thread only)."""
+        while True:
+            try:
+                kind, pack_number, success = self._events.get_nowait()
+            except queue.Empty:
+                return
+            
+            if kind == 'done':
+                if success:
+                    self.completed_packs += 1
+                else:
+                    self.failed_packs += 1
     
     def _print_progress(self):
         """Print the current progress without breaking terminal output."""
-        with self.progress_lock:
-            completed = self.completed_packs
-            failed = self.failed_packs
-            total = self.total_packs
+        completed = self.completed_packs
+        failed = self.failed_packs
+        total = self.total_packs
+        
+        with self._state_lock:
             in_progress = len(self.downloads_in_progress)
             
             # Get in-progress download information
@@ -197,6 +466,19 @@ class DownloadManager:
             
             print("", end="\r", flush=True)
 
+    def _sample_progress(self, elapsed):
+        """Update downloaded bytes and speed of active packs from their file positions."""
+        with self._state_lock:
+            for pack_number, file in self._active_files.items():
+                try:
+                    position = file.tell()
+                except ValueError:
+                    continue  # File was closed between samples
+                
+                status = self.pack_status[pack_number]
+                status['speed'] = (position - status['downloaded']) / elapsed / (1024 * 1024)  # MB/s
+                status['downloaded'] = position
+    
     def _print_final_summary(self):
         """Print a final summary of the download process."""
         # Clear the current line
@@ -210,163 +492,332 @@ class DownloadManager:
             failed_packs = [pack for pack, result in self.results.items() if not result['success']]
             print(f"Failed packs: {', '.join(map(str, failed_packs))}")
     
-    def _create_optimized_session(self):
-        """Create a requests session with optimized settings for downloads."""
-        session = requests.Session()
-        
+    def _create_pool_manager(self):
+        """Create a urllib3 pool manager with optimized settings for downloads."""
         # Configure retries with backoff
         retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
+            total=DEFAULT_RETRIES,
+            backoff_factor=DEFAULT_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_CODES
         )
         
-        # Apply retry strategy to both http and https
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        
-        # Set a reasonable timeout
-        session.timeout = DEFAULT_TIMEOUT
-        
-        # Set headers to mimic a browser
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Cache-Control': 'max-age=0'
-        })
-        
-        return session
-    
-    def _get_download_urls(self, pack_number):
-        """Generate possible download URLs for a given pack number."""
-        return [
-            f"https://packs.ppy.sh/S{pack_number}%20-%20osu%21%20Beatmap%20Pack%20%23{pack_number}.zip",
-            f"https://packs.ppy.sh/S{pack_number}%20-%20Beatmap%20Pack%20%23{pack_number}.zip",
-            f"https://packs.ppy.sh/S{pack_number}%20-%20Beatmap%20Pack%20%23{pack_number}.7z"
-        ]
-    
-    def _get_filename_from_url(self, url, pack_number):
-        """Extract appropriate filename from URL."""
-        if url.endswith('.7z'):
-            return f"Beatmap Pack #{pack_number}.7z"
-        elif "osu%21" in url:
-            return f"osu! Beatmap Pack #{pack_number}.zip"
-        else:
-            return f"Beatmap Pack #{pack_number}.zip"
+        # Every request goes to packs.ppy.sh, so a single pool sized for all
+        # workers' downloads and probes lets them reuse the same sockets
+        pool_kwargs = dict(
+            num_pools=1,
+            maxsize=self._pool_size,
+            block=True,
+            retries=retry_strategy,
+            timeout=urllib3.Timeout(DEFAULT_TIMEOUT),
+            headers=DEFAULT_HEADERS
+        )
+        
+        # Honour HTTPS_PROXY/NO_PROXY like requests did; the proxy resolves
+        # the download host itself, so the DNS cache only applies without one
+        proxy_url = get_proxy_url()
+        if proxy_url:
+            proxy_auth = urllib3.util.parse_url(proxy_url).auth
+            proxy_headers = urllib3.make_headers(proxy_basic_auth=proxy_auth) if proxy_auth else None
+            logger.info(f"Using proxy {urllib3.util.parse_url(proxy_url).host}")
+            return urllib3.ProxyManager(proxy_url, proxy_headers=proxy_headers, **pool_kwargs)
+        
+        http = urllib3.PoolManager(**pool_kwargs)
+        
+        # Use pools whose connections skip repeated DNS lookups (httpx does
+        # its own resolution, so only this path uses the cache)
+        http.pool_classes_by_scheme = {
+            'http': _CachedDNSHTTPConnectionPool,
+            'https': _CachedDNSHTTPSConnectionPool,
+        }
+        
+        # Resolve the download host up front; new connections reuse the cached addresses
+        try:
+            resolve_host(DOWNLOAD_HOST)
+        except OSError as e:
+            logger.warning(f"Failed to resolve {DOWNLOAD_HOST}: {str(e)}")
+        
+        return http
+    
+    def _check_pack_response(self, response):
+        """Return why a 200/206 response doesn't look like a pack archive, or None if it does."""
+        content_type = response.headers.get('content-type', '')
+        if not content_type.startswith(('application/', 'binary/')):
+            return f"unexpected Content-Type '{content_type}'"
+        
+        # Only full responses have a meaningful minimum size; a resumed range may be tiny
+        content_length = response.headers.get('content-length')
+        if response.status == 200 and content_length is not None and int(content_length) <= MIN_PACK_SIZE:
+            return f"too small to be a pack ({content_length} bytes)"
+        
+        return None
+    
+    def _probe_urls(self, urls):
+        """Send HEAD requests for all URL patterns concurrently.
+        
+        Returns the URLs still worth a GET, in pattern order: those whose probe
+        raised, up to and including the first that looks like a pack.
+        """
+        futures = {self._probe_executor.submit(self._http.request, 'HEAD', url, redirect=True): url
+                   for url in urls}
+        live = {}  # url -> True (a pack), False (ruled out) or None (probe raised)
+        to_fetch = []
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                url = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.debug(f"Probe failed for {url}: {str(e)}")
+                    live[url] = None
+                else:
+                    live[url] = False
+                    if response.status == 200 or response.status == 206:
+                        problem = self._check_pack_response(response)
+                        if not problem:
+                            live[url] = True
+                        else:
+                            logger.debug(f"Probe of {url} rejected: {problem}")
+                    else:
+                        logger.debug(f"Probe of {url} returned HTTP {response.status}")
+                
+                # Keep the pattern priority: a live URL only wins once every
+                # earlier pattern has answered
+                to_fetch = []
+                for candidate in urls:
+                    if candidate not in live:
+                        break
+                    if live[candidate] is not False:
+                        to_fetch.append(candidate)
+                    if live[candidate]:
+                        return to_fetch
+        finally:
+            # Don't wait on the slower probes once we have an answer
+            for future in futures:
+                future.cancel()
+        
+        return to_fetch
+    
+    def _get_resume_url(self, candidates):
+        """Return the URL recorded next to an existing .part file, if any."""
+        if not self.resume:
+            return None
+        
+        for url, filename, filepath, temp_filepath in candidates:
+            if f"{filename}.part" in self._existing_files and f"{filename}.part.url" in self._existing_files:
+                try:
+                    with open(f"{temp_filepath}.url", 'r') as f:
+                        recorded_url = f.read().strip()
+                except OSError as e:
+                    logger.debug(f"Failed to read {temp_filepath}.url: {str(e)}")
+                    continue
+                if recorded_url == url:
+                    return url
+        
+        return None
+    
+    def _open_part_file(self, temp_filepath, resume_size, total_size):
+        """Open a .part file for writing, preallocating it when it will never be resumed."""
+        # Buffer writes in memory so most chunks don't hit the disk individually
+        if resume_size > 0:
+            return open(temp_filepath, 'ab', buffering=DEFAULT_WRITE_BUFFER_SIZE)
+        # A resumable .part's size is its resume offset, which a preallocated file
+        # left behind by a hard kill would misreport, so only preallocate with --no-resume
+        if self.resume or total_size <= 0 or not hasattr(os, 'posix_fallocate'):
+            return open(temp_filepath, 'wb', buffering=DEFAULT_WRITE_BUFFER_SIZE)
+        
+        fd = os.open(temp_filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            # Reserve the space up front: fewer extents and less fragmentation while streaming
+            os.posix_fallocate(fd, 0, total_size)
+        except OSError as e:
+            logger.debug(f"Preallocation not supported for {temp_filepath}: {str(e)}")
+        return os.fdopen(fd, 'wb', buffering=DEFAULT_WRITE_BUFFER_SIZE)
+    
+    def _is_part_complete(self, response, temp_filename, resume_size):
+        """Check whether a 416 answer means the .part already holds the whole file."""
+        # Only .part files with a sidecar are written sequentially (never preallocated),
+        # so only their size is trustworthy
+        if f"{temp_filename}.url" not in self._existing_files:
+            return False
+        content_range = response.headers.get('content-range', '')
+        return content_range == f"bytes */{resume_size}"
     
-    def _download_pack(self, pack_number, session):
+    def _finish_part(self, temp_filepath, filepath, temp_filename, filename):
+        """Move a finished .part file to its final name and drop its sidecar."""
+        os.rename(temp_filepath, filepath)
+        try:
+            os.remove(f"{temp_filepath}.url")
+        except FileNotFoundError:
+            pass
+        with self._state_lock:
+            self._existing_files.discard(temp_filename)
+            self._existing_files.discard(f"{temp_filename}.url")
+            self._existing_files.add(filename)
+    
+    def _download_pack(self, pack_number):
         """Download a specific beatmap pack by trying different URL patterns."""
-        possible_urls = self._get_download_urls(pack_number)
+        # Work out every candidate's URL, filename and paths once per pack
+        candidates = []
+        for url in get_download_urls(pack_number):
+            filename = get_filename_from_url(url, pack_number)
+            filepath = os.path.join(self.download_dir, filename)
+            candidates.append((url, filename, filepath, f"{filepath}.part"))
         
         # Check if any of the possible files already exist
-        for url in possible_urls:
-            filename = self._get_filename_from_url(url, pack_number)
-            filepath = os.path.join(self.download_dir, filename)
-            if os.path.exists(filepath):
+        for url, filename, filepath, _ in candidates:
+            if filename in self._existing_files:
                 logger.info(f"Pack #{pack_number} already exists as {filename}. Skipping.")
                 return True, url, filepath
         
+        resume_url = self._get_resume_url(candidates)
+        if resume_url:
+            # A partial download recorded which URL it came from; try that one
+            # first and skip probing, since its ranged GET answers the same question
+            candidates.sort(key=lambda c: c[0] != resume_url)
+        else:
+            # Find the live URL pattern up front; patterns the probe ruled out
+            # aren't fetched again, only those whose probe failed are tried in order
+            to_fetch = self._probe_urls([url for url, _, _, _ in candidates])
+            candidates = [c for c in candidates if c[0] in to_fetch]
+        
         # Try each possible URL pattern
-        for url in possible_urls:
-            filename = self._get_filename_from_url(url, pack_number)
-            filepath = os.path.join(self.download_dir, filename)
-            temp_filepath = f"{filepath}.part"
-            
+        for url, filename, filepath, temp_filepath in candidates:
             # Set file paths in status
-            with self.lock:
+            with self._state_lock:
                 self.pack_status[pack_number]['file_path'] = filepath
                 self.pack_status[pack_number]['url'] = url
             
             # Check for partially downloaded file
             resume_size = 0
-            if self.resume and os.path.exists(temp_filepath):
-                resume_size = os.path.getsize(temp_filepath)
-                logger.info(f"Resuming download of pack #{pack_number} from {resume_size} bytes")
+            temp_filename = f"{filename}.part"
+            if self.resume and temp_filename in self._existing_files:
+                try:
+                    resume_size = os.path.getsize(temp_filepath)
+                    logger.info(f"Resuming download of pack #{pack_number} from {resume_size} bytes")
+                except FileNotFoundError:
+                    # The directory listing is from startup; the .part has since gone
+                    with self._state_lock:
+                        self._existing_files.discard(temp_filename)
             
+            response = None
             try:
                 logger.info(f"Trying URL: {url}")
                 
-                # Use a HEAD request first to check if the URL is valid and get content length
+                # Open the streaming GET directly; its status and headers tell us
+                # whether this URL pattern is valid, so no separate HEAD is needed
                 headers = {}
                 if resume_size > 0:
                     headers['Range'] = f'bytes={resume_size}-'
                 
-                head_response = session.head(url, allow_redirects=True)
+                response = self._http.request('GET', url, headers=headers, redirect=True,
+                                              preload_content=False)
+                
+                if response.status == 416 and resume_size > 0:
+                    response.drain_conn()
+                    response.release_conn()
+                    
+                    # Interrupted after the last byte but before the rename
+                    if self._is_part_complete(response, temp_filename, resume_size):
+                        self._finish_part(temp_filepath, filepath, temp_filename, filename)
+                        logger.info(f"Partial file for pack #{pack_number} was already complete")
+                        return True, url, filepath
+                    
+                    # Otherwise its size can't be trusted as an offset (the file changed,
+                    # or it was preallocated by a --no-resume run); start over
+                    logger.info(f"Partial file for pack #{pack_number} can't be resumed, restarting download")
+                    resume_size = 0
+                    os.remove(temp_filepath)
+                    with self._state_lock:
+                        self._existing_files.discard(temp_filename)
+                    response = self._http.request('GET', url, redirect=True, preload_content=False)
                 
                 # If we got a 404, try the next URL pattern
-                if head_response.status_code == 404:
+                if response.status == 404:
                     logger.info(f"URL not found: {url}")
+                    response.drain_conn()
+                    response.release_conn()
                     continue
                 
                 # Check if the URL is valid
-                if head_response.status_code != 200 and head_response.status_code != 206:
-                    logger.warning(f"Failed to access URL. HTTP Status: {head_response.status_code}")
+                if response.status != 200 and response.status != 206:
+                    logger.warning(f"Failed to access URL. HTTP Status: {response.status}")
+                    response.drain_conn()
+                    response.release_conn()
                     continue
                 
-                # Get the download size
-                total_size = int(head_response.headers.get('content-length', 0))
-                if resume_size > 0 and head_response.status_code == 200:
+                # Get the download size (remaining bytes when resuming with 206)
+                total_size = int(response.headers.get('content-length', 0))
+                
+                # Reject error pages served with a 200 before writing anything to disk
+                problem = self._check_pack_response(response)
+                if problem:
+                    logger.warning(f"Skipping {url}: {problem}")
+                    # Don't read the error page; close the socket but give the slot back
+                    response.close()
+                    response.release_conn()
+                    continue
+                if resume_size > 0 and response.status == 200:
                     # Server doesn't support range requests, restart download
                     resume_size = 0
-                    if os.path.exists(temp_filepath):
-                        os.remove(temp_filepath)
-                
-                # Update status with size
-                with self.lock:
-                    self.pack_status[pack_number]['size'] = total_size + resume_size
-                
-                # Stream the download with larger chunks
-                response = session.get(url, stream=True, headers=headers)
+                    os.remove(temp_filepath)
+                    with self._state_lock:
+                        self._existing_files.discard(temp_filename)
                 
-                # Open file in appropriate mode based on whether resuming
-                file_mode = 'ab' if resume_size > 0 else 'wb'
+                # Record where a new .part comes from so a later resume can go straight
+                # to it; without resume the .part may be preallocated, so it gets none
+                if resume_size == 0 and self.resume:
+                    with open(f"{temp_filepath}.url", 'w') as f:
+                        f.write(url)
+                elif resume_size == 0 and f"{temp_filename}.url" in self._existing_files:
+                    os.remove(f"{temp_filepath}.url")
+                    with self._state_lock:
+                        self._existing_files.discard(f"{temp_filename}.url")
                 
-                with open(temp_filepath, file_mode) as file:
-                    start_time = time.time()
-                    downloaded = resume_size
-                    last_update_time = start_time
-                    bytes_since_last_update = 0
+                with self._open_part_file(temp_filepath, resume_size, total_size) as file:
+                    # Let the progress reporter track this file
+                    with self._state_lock:
+                        status = self.pack_status[pack_number]
+                        status['size'] = total_size + resume_size
+                        status['downloaded'] = resume_size
+                        status['speed'] = 0
+                        self._active_files[pack_number] = file
                     
-                    for chunk in response.iter_content(chunk_size=self.chunk_size):
-                        if chunk:
-                            file.write(chunk)
-                            
-                            # Update progress
-                            downloaded += len(chunk)
-                            bytes_since_last_update += len(chunk)
-                            
-                            # Update download speed every second
-                            current_time = time.time()
-                            if current_time - last_update_time >= 1.0:
-                                elapsed = current_time - last_update_time
-                                speed = bytes_since_last_update / elapsed / (1024 * 1024)  # MB/s
-                                
-                                with self.lock:
-                                    self.pack_status[pack_number]['downloaded'] = downloaded
-                                    self.pack_status[pack_number]['speed'] = speed
-                                
-                                bytes_since_last_update = 0
-                                last_update_time = current_time
-                            
-                            # Implement bandwidth limiting if needed
-                            if self.bandwidth_limit:
-                                ideal_time = len(chunk) / (self.bandwidth_limit * 1024 * 1024)
-                                actual_time = time.time() - start_time
-                                if ideal_time > actual_time:
-                                    time.sleep(ideal_time - actual_time)
+                    try:
+                        if self.bandwidth_limit:
+                            throttle = _make_throttle(self.bandwidth_limit)
+                            for chunk in response.stream(self.chunk_size):
+                                file.write(chunk)
+                                throttle(len(chunk))
+                        else:
+                            # Unthrottled: copy the whole body without per-chunk Python work
+                            shutil.copyfileobj(response, file, length=self.chunk_size)
+                    finally:
+                        with self._state_lock:
+                            self._active_files.pop(pack_number, None)
+                        
+                        # Cut off preallocated space past what was written, so the
+                        # file size stays a valid resume offset
+                        try:
+                            file.truncate()
+                        except OSError as e:
+                            logger.debug(f"Failed to truncate {temp_filepath}: {str(e)}")
+                
+                # Body fully read, so the connection can go back to the pool
+                response.release_conn()
                 
                 # Rename the file when download is complete
-                os.rename(temp_filepath, filepath)
+                self._finish_part(temp_filepath, filepath, temp_filename, filename)
                 logger.info(f"Successfully downloaded Pack #{pack_number}")
                 
                 return True, url, filepath
                 
             except Exception as e:
                 logger.error(f"Error downloading {url} for pack #{pack_number}: {str(e)}")
+                if response is not None:
+                    # Close the half-read socket so it isn't reused, but give its
+                    # slot back to the pool, which opens a fresh connection later
+                    response.close()
+                    response.release_conn()
         
         logger.error(f"Failed to download Pack #{pack_number} after trying all URL patterns.")
         return False, None, None
@@ -381,48 +832,60 @@ class ConfigManager:
     
     def _load_config(self):
         """Load configuration from file or return defaults."""
+        config = None
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
+                if orjson is not None:
+                    config = orjson.loads(Path(self.config_file).read_bytes())
+                else:
+                    with open(self.config_file, 'r') as f:
+                        config = json.load(f)
             except Exception as e:
                 logger.warning(f"Failed to load config file: {str(e)}")
         
-        # Return default config
-        return {
-            'download_dir': './osu_packs',
-            'threads': DEFAULT_THREADS,
-            'chunk_size': DEFAULT_CHUNK_SIZE,
-            'delay': True,
-            'completed_packs': [],
-            'failed_packs': []
-        }
+        if config is None:
+            # Default config
+            config = {
+                'download_dir': './osu_packs',
+                'threads': DEFAULT_THREADS,
+                'chunk_size': DEFAULT_CHUNK_SIZE,
+                'delay': True,
+                'completed_packs': [],
+                'failed_packs': []
+            }
+        
+        # Config files only ever stored the default chunk size (--chunk-size is
+        # never saved), so the old default means "unset": move it to the new one
+        if config.get('chunk_size', LEGACY_DEFAULT_CHUNK_SIZE) == LEGACY_DEFAULT_CHUNK_SIZE:
+            config['chunk_size'] = DEFAULT_CHUNK_SIZE
+        
+        # Keep pack lists as sets in memory for O(1) membership and updates
+        config['completed_packs'] = set(config.get('completed_packs', []))
+        config['failed_packs'] = set(config.get('failed_packs', []))
+        return config
     
     def save_config(self):
         """Save current configuration to file."""
+        data = dict(self.config)
+        data['completed_packs'] = sorted(self.config['completed_packs'])
+        data['failed_packs'] = sorted(self.config['failed_packs'])
+        
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            if orjson is not None:
+                Path(self.config_file).write_bytes(
+                    orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+                )
+            else:
+                with open(self.config_file, 'w') as f:
+                    json.dump(data, f, indent=2, sort_keys=True)
             logger.info(f"Configuration saved to {self.config_file}")
         except Exception as e:
             logger.error(f"Failed to save config file: {str(e)}")
     
     def update_downloaded_packs(self, results):
-        """Update the list of completed packs."""
-        for pack_num, result in results.items():
-            if result['success']:
-                if pack_num not in self.config['completed_packs']:
-                    self.config['completed_packs'].append(pack_num)
-            else:
-                if pack_num not in self.config['failed_packs']:
-                    self.config['failed_packs'].append(pack_num)
-        
-        # Sort the lists
-        self.config['completed_packs'].sort()
-        self.config['failed_packs'].sort()
-        
-        # Save the updated config
-        self.save_config()
+        """Update the sets of completed and failed packs (call save_config to persist)."""
+        self.config['completed_packs'] |= {p for p, r in results.items() if r['success']}
+        self.config['failed_packs'] |= {p for p, r in results.items() if not r['success']}
 
 
 def main():
@@ -485,6 +948,26 @@ def main():
     if not pack_numbers:
         parser.error("No packs specified to download. Use --start/--end, --packs, or --retry-failed")
     
+    # List the download directory once and skip packs that are already on disk
+    try:
+        existing_files = set(os.listdir(download_dir))
+    except FileNotFoundError:
+        existing_files = set()
+    
+    already_downloaded = {
+        p for p in pack_numbers
+        if any(get_filename_from_url(url, p) in existing_files for url in get_download_urls(p))
+    }
+    if already_downloaded:
+        logger.info(f"Skipping {len(already_downloaded)} pack(s) already in {download_dir}")
+        config['completed_packs'] |= already_downloaded
+        pack_numbers = [p for p in pack_numbers if p not in already_downloaded]
+    
+    if not pack_numbers:
+        logger.info("All requested packs are already downloaded")
+        config_manager.save_config()
+        return 0
+    
     # Create download manager
     download_manager = DownloadManager(
         download_dir=download_dir,
@@ -492,7 +975,8 @@ def main():
         chunk_size=chunk_size,
         delay=delay,
         resume=not args.no_resume,
-        bandwidth_limit=args.bandwidth_limit
+        bandwidth_limit=args.bandwidth_limit,
+        existing_files=existing_files
     )
     
     # Add packs to queue
@@ -502,8 +986,9 @@ def main():
     # Start downloads
     results = download_manager.start_downloads()
     
-    # Update config with results
+    # Update config with results and save once at the end
     config_manager.update_downloaded_packs(results)
+    config_manager.save_config()
     
     return 0
 